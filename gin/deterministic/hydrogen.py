@@ -45,308 +45,104 @@ def add_hydrogen(mol):
     ----------
     mol : gin.molecule.Molecule object
     """
-
-    atoms = mol[0]
-    adjacency_map = mol[1]
-    # get the current atoms and adjacency map
-    adjacency_map_full = tf.transpose(adjacency_map) + adjacency_map
+    return _add_hydrogen(mol[0], mol[1])
+
+# NOTE: traced once with unknown shapes,
+#       so that molecules of all sizes share the same graph
+@tf.function(
+    input_signature=[
+        tf.TensorSpec(shape=[None], dtype=tf.int64),
+        tf.TensorSpec(shape=[None, None], dtype=tf.float32)])
+def _add_hydrogen(atoms, adjacency_map):
     n_atoms = tf.shape(atoms, tf.int64)[0]
 
     # type the atoms
-    atom_types = typing.TypingGAFF(mol)
-
-    # calculate the number of hydrogens added to heavy atoms
-    # the heavy atoms with one hydrogen
-    has_one = tf.reduce_any(
-        tf.reshape(
-            tf.concat(
-                [
-                    # sp3 carbon
-                    tf.logical_and(
-                        atom_types.is_carbon,
-                        tf.logical_and(
-                            atom_types.is_sp3,
-                            atom_types.is_connected_to_3_heavy)),
-
-                    # sp2 carbon
-                    tf.logical_and(
-                        atom_types.is_carbon,
-                        tf.logical_and(
-                            atom_types.is_sp2,
-                            atom_types.is_connected_to_2_heavy)),
-
-                    # sp1 carbon
-                    tf.logical_and(
-                        atom_types.is_carbon,
-                        tf.logical_and(
-                            atom_types.is_sp1,
-                            atom_types.is_connected_to_1_heavy)),
-
-                    # sp3 nitrogen or phosphorus
-                    tf.logical_and(
-                        tf.logical_or(
-                            atom_types.is_nitrogen,
-                            atom_types.is_phosphorus),
-                        tf.logical_and(
-                            atom_types.is_sp3,
-                            atom_types.is_connected_to_2_heavy)),
+    atom_types = typing.TypingGAFF([atoms, adjacency_map])
 
-                    # sp2 nitrogen or phosphorus
-                    tf.logical_and(
-                        tf.logical_or(
-                            atom_types.is_nitrogen,
-                            atom_types.is_phosphorus),
-                        tf.logical_and(
-                            atom_types.is_sp2,
-                            atom_types.is_connected_to_1_heavy)),
+    # grab the element and hybridization masks once
+    is_c = atom_types.is_carbon
+    is_n_or_p = atom_types.is_nitrogen | atom_types.is_phosphorus
+    is_o_or_s = atom_types.is_oxygen | atom_types.is_sulfur
 
-                    # sp3 oxygen or sulfur
-                    tf.logical_and(
-                        tf.logical_or(
-                            atom_types.is_oxygen,
-                            atom_types.is_sulfur),
-                        atom_types.is_sp3)
+    is_sp1 = atom_types.is_sp1
+    is_sp2 = atom_types.is_sp2
+    is_sp3 = atom_types.is_sp3
 
-                ],
-                axis=0),
-            [-1, tf.shape(atoms, tf.int64)[0]]),
-        axis=0)
+    is_connected_to_1_heavy = atom_types.is_connected_to_1_heavy
+    is_connected_to_2_heavy = atom_types.is_connected_to_2_heavy
+    is_connected_to_3_heavy = atom_types.is_connected_to_3_heavy
 
-    one_idxs = tf.boolean_mask(
-        tf.range(
-            tf.shape(atoms, tf.int64)[0],
-            dtype=tf.int64),
-        has_one)
+    # calculate the number of hydrogens added to heavy atoms
+    # the heavy atoms with one hydrogen
+    has_one = (
+        # sp3, sp2, or sp1 carbon
+        is_c & (
+            (is_sp3 & is_connected_to_3_heavy)
+            | (is_sp2 & is_connected_to_2_heavy)
+            | (is_sp1 & is_connected_to_1_heavy))
+
+        # sp3 or sp2 nitrogen or phosphorus
+        | is_n_or_p & (
+            (is_sp3 & is_connected_to_2_heavy)
+            | (is_sp2 & is_connected_to_1_heavy))
+
+        # sp3 oxygen or sulfur
+        | is_o_or_s & is_sp3)
+
+    one_idxs = tf.reshape(
+        tf.where(
+            has_one),
+        [-1])
 
     # the heavy atoms with two hydrogens
-    has_two = tf.reduce_any(
-        tf.reshape(
-            tf.concat(
-                [
-                    # sp3 carbon
-                    tf.logical_and(
-                        atom_types.is_carbon,
-                        tf.logical_and(
-                            atom_types.is_sp3,
-                            atom_types.is_connected_to_2_heavy)),
+    has_two = (
+        # sp3 or sp2 carbon
+        is_c & (
+            (is_sp3 & is_connected_to_2_heavy)
+            | (is_sp2 & is_connected_to_1_heavy))
 
-                    # sp2 carbon
-                    tf.logical_and(
-                        atom_types.is_carbon,
-                        tf.logical_and(
-                            atom_types.is_sp2,
-                            atom_types.is_connected_to_1_heavy)),
+        # sp3 nitrogen or phosphorus
+        | is_n_or_p & is_sp3 & is_connected_to_1_heavy)
 
-                    # sp3 nitrogen or phosphorus
-                    tf.logical_and(
-                        tf.logical_or(
-                            atom_types.is_nitrogen,
-                            atom_types.is_phosphorus),
-                        tf.logical_and(
-                            atom_types.is_sp3,
-                            atom_types.is_connected_to_1_heavy))
-
-                ],
-                axis=0),
-            [-1, tf.shape(atoms)[0]]),
-        axis=0)
-
-    two_idxs = tf.boolean_mask(
-        tf.range(
-            tf.shape(atoms, tf.int64)[0],
-            dtype=tf.int64),
-        has_two)
+    two_idxs = tf.reshape(
+        tf.where(
+            has_two),
+        [-1])
 
     # the heavy atoms with three hydrogens
-    has_three = tf.logical_and(
-        atom_types.is_carbon,
-        tf.logical_and(
-            atom_types.is_sp3,
-            atom_types.is_connected_to_1_heavy))
-
-    three_idxs = tf.boolean_mask(
-        tf.range(
-            tf.shape(atoms, tf.int64)[0],
-            dtype=tf.int64),
-        has_three)
-
-    # build the adjacency map blocks to be appended to the map
-    # TODO: figure out a way to do this more efficiently
-
-    # init
-    hydrogen_block = tf.tile(
-        tf.constant(
-            -1,
-            shape=[1, 1,],
-            dtype=tf.float32),
-        [tf.shape(atoms)[0], 1])
-
-    def one_body(idx, hydrogen_block):
-        # grab idx to update
-        one_idx = one_idxs[idx]
-
-        # get the new line to append
-        new_line = tf.expand_dims(
-            tf.where(
-                tf.equal(
-                    tf.range(
-                        tf.shape(atoms, tf.int64)[0],
-                        dtype=tf.int64),
-                    one_idx),
-
-                # if is one_idx
-                tf.ones_like(atoms, dtype=tf.float32),
-
-                # else:
-                tf.zeros_like(atoms, dtype=tf.float32)),
-
-            axis=1)
-
-        # append it to the matrix
-        hydrogen_block = tf.concat(
-            [
-                hydrogen_block,
-                new_line # do this once
-            ],
-            axis=1)
-
-        return idx + 1, hydrogen_block
-
-    def two_body(idx, hydrogen_block):
-        # grab idx to update
-        two_idx = two_idxs[idx]
-
-        # get the new line to append
-        new_line = tf.expand_dims(
-            tf.where(
-                tf.equal(
-                    tf.range(
-                        tf.shape(atoms, tf.int64)[0],
-                        dtype=tf.int64),
-                    two_idx),
-
-                # if is one_idx
-                tf.ones_like(atoms, dtype=tf.float32),
-
-                # else:
-                tf.zeros_like(atoms, dtype=tf.float32)),
-
-            axis=1)
-
-        # append it to the matrix
-        hydrogen_block = tf.concat(
-            [
-                hydrogen_block,
-                new_line, # do this twice
-                new_line
-            ],
-            axis=1)
-
-        return idx + 1, hydrogen_block
-
-    def three_body(idx, hydrogen_block):
-        # grab idx to update
-        three_idx = three_idxs[idx]
-
-        # get the new line to append
-        new_line = tf.expand_dims(
-            tf.where(
-                tf.equal(
-                    tf.range(
-                        tf.shape(atoms, tf.int64)[0],
-                        dtype=tf.int64),
-                    three_idx),
-
-                # if is one_idx
-                tf.ones_like(atoms, dtype=tf.float32),
-
-                # else:
-                tf.zeros_like(atoms, dtype=tf.float32)),
-
-            axis=1)
-
-        # append it to the matrix
-        hydrogen_block = tf.concat(
-            [
-                hydrogen_block,
-                new_line, # do this three times
-                new_line,
-                new_line
-            ],
-            axis=1)
-
-        return idx + 1, hydrogen_block
-
-    # execute all the functions
-    # one
-    idx = tf.constant(0, dtype=tf.int64)
-    idx, hydrogen_block = tf.while_loop(
-        # condition
-        lambda idx, _: tf.less(
-            idx,
-            tf.math.count_nonzero(has_one)),
-
-        # body
-        one_body,
-
-        # var
-        [idx, hydrogen_block],
-
-        # invar
-        shape_invariants=[
-            idx.get_shape(),
-            tf.TensorShape([
-                atoms.shape[0],
-                None])])
-
-    # execute all the functions
-    # two
-    idx = tf.constant(0, dtype=tf.int64)
-    idx, hydrogen_block = tf.while_loop(
-        # condition
-        lambda idx, _: tf.less(
-            idx,
-            tf.math.count_nonzero(has_two)),
-
-        # body
-        two_body,
-
-        # var
-        [idx, hydrogen_block],
-
-        # invar
-        shape_invariants=[
-            idx.get_shape(),
-            tf.TensorShape([
-                atoms.shape[0],
-                None])])
-
-    # execute all the functions
-    idx = tf.constant(0, dtype=tf.int64)
-    idx, hydrogen_block = tf.while_loop(
-        # condition
-        lambda idx, _: tf.less(
-            idx,
-            tf.math.count_nonzero(has_three)),
-
-        # body
-        three_body,
-
-        # var
-        [idx, hydrogen_block],
-
-        # invar
-        shape_invariants=[
-            idx.get_shape(),
-            tf.TensorShape([
-                atoms.shape[0],
-                None])])
-
-    # get rid of the first block
-    hydrogen_block = hydrogen_block[:, 1:]
+    has_three = is_c & is_sp3 & is_connected_to_1_heavy
+
+    three_idxs = tf.reshape(
+        tf.where(
+            has_three),
+        [-1])
+
+    # each hydrogen is bonded to exactly one heavy atom,
+    # so we list the heavy atom of every hydrogen to be added.
+    # the heavy atoms with two or three hydrogens are repeated
+    # so that every hydrogen is listed once
+    hydrogen_heavy_idxs = tf.concat(
+        [
+            one_idxs,
+            tf.reshape(
+                tf.tile(
+                    tf.expand_dims(
+                        two_idxs,
+                        1),
+                    [1, 2]),
+                [-1]),
+            tf.reshape(
+                tf.tile(
+                    tf.expand_dims(
+                        three_idxs,
+                        1),
+                    [1, 3]),
+                [-1])
+        ],
+        axis=0)
 
     # get the total number of hydrogen
-    n_hydrogens = tf.shape(hydrogen_block, tf.int64)[1]
+    n_hydrogens = tf.shape(hydrogen_heavy_idxs, tf.int64)[0]
 
     # modify the attributes of molecules
     atoms = tf.concat(
@@ -356,20 +152,25 @@ def add_hydrogen(mol):
         ],
         axis=0)
 
-    adjacency_map = tf.concat(
+    # the heavy atom - hydrogen bonds, in sparse form
+    # (n_hydrogens, 2)
+    hydrogen_bond_idxs = tf.stack(
         [
-            adjacency_map,
-            hydrogen_block
+            hydrogen_heavy_idxs,
+            n_atoms + tf.range(n_hydrogens, dtype=tf.int64)
         ],
         axis=1)
 
-    adjacency_map = tf.concat(
-        [
-            adjacency_map,
-            tf.zeros(
-                (n_hydrogens, n_atoms + n_hydrogens),
-                tf.float32)
-        ],
-        axis=0)
+    # pad the adjacency map with zeros for the hydrogens
+    # and only write the bonds,
+    # instead of building and concatenating a dense hydrogen block
+    adjacency_map = tf.pad(
+        adjacency_map,
+        [[0, n_hydrogens], [0, n_hydrogens]])
+
+    adjacency_map = tf.tensor_scatter_nd_update(
+        adjacency_map,
+        hydrogen_bond_idxs,
+        tf.ones((n_hydrogens, ), dtype=tf.float32))
 
     return [atoms, adjacency_map]
@@ -0,0 +1,46 @@
+import pytest
+import gin
+import numpy as np
+import numpy.testing as npt
+
+
+def test_ethane():
+    mol = gin.i_o.from_smiles.to_mol('CC')
+    atoms, adjacency_map = gin.deterministic.hydrogen.add_hydrogen(mol)
+    npt.assert_almost_equal(
+        atoms.numpy(),
+        np.array([0, 0, 9, 9, 9, 9, 9, 9]))
+    npt.assert_almost_equal(
+        adjacency_map.numpy(),
+        np.array(
+            [[0, 1, 1, 1, 1, 0, 0, 0],
+             [0, 0, 0, 0, 0, 1, 1, 1],
+             [0, 0, 0, 0, 0, 0, 0, 0],
+             [0, 0, 0, 0, 0, 0, 0, 0],
+             [0, 0, 0, 0, 0, 0, 0, 0],
+             [0, 0, 0, 0, 0, 0, 0, 0],
+             [0, 0, 0, 0, 0, 0, 0, 0],
+             [0, 0, 0, 0, 0, 0, 0, 0]]))
+
+def test_ethanol():
+    mol = gin.i_o.from_smiles.to_mol('CCO')
+    atoms, adjacency_map = gin.deterministic.hydrogen.add_hydrogen(mol)
+    npt.assert_almost_equal(
+        atoms.numpy(),
+        np.array([0, 0, 2, 9, 9, 9, 9, 9, 9]))
+    npt.assert_almost_equal(
+        adjacency_map.numpy()[:3, 3:],
+        np.array(
+            [[0, 0, 0, 1, 1, 1],
+             [0, 1, 1, 0, 0, 0],
+             [1, 0, 0, 0, 0, 0]]))
+
+def test_benzene():
+    mol = gin.i_o.from_smiles.to_mol('c1ccccc1')
+    atoms, adjacency_map = gin.deterministic.hydrogen.add_hydrogen(mol)
+    npt.assert_almost_equal(
+        atoms.numpy(),
+        np.array([0] * 6 + [9] * 6))
+    npt.assert_almost_equal(
+        adjacency_map.numpy()[:6, 6:],
+        np.eye(6))
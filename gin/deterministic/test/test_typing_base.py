@@ -0,0 +1,31 @@
+import gin
+import pytest
+import numpy as np
+import numpy.testing as npt
+
+def test_halogens():
+    # chlorine and bromine are told apart
+    # once both properties are cached
+    mol = gin.i_o.from_smiles.to_mol('ClCCBr')
+    typing = gin.deterministic.typing.TypingBase(mol)
+
+    npt.assert_equal(
+        typing.is_chlorine.numpy(),
+        np.array([True, False, False, False]))
+
+    npt.assert_equal(
+        typing.is_bromine.numpy(),
+        np.array([False, False, False, True]))
+
+@pytest.mark.parametrize('name', [
+    'is_carbon',
+    'is_chlorine',
+    'is_bromine',
+    'is_sp3',
+    'is_connected_to_carbon'])
+def test_property_cached(name):
+    mol = gin.i_o.from_smiles.to_mol('ClCCBr')
+    typing = gin.deterministic.typing.TypingBase(mol)
+
+    # the second call returns the cached object
+    assert getattr(typing, name) is getattr(typing, name)
@@ -53,6 +53,11 @@ class TypingBase(object):
     is_{type} :
         whether the idx'th atom in the molecule is of that type or not
 
+    NOTE: the `is_{type}` properties cache their results
+          in name-mangled attributes,
+          (`self.__is_carbon` is stored as `self._TypingBase__is_carbon`)
+          so that is the name they check for.
+
     """
     def __init__(self, mol):
         # get the adjacency_map
@@ -73,7 +78,7 @@ class TypingBase(object):
 
     @property
     def is_carbon(self):
-        if not hasattr(self, '__is_carbon'):
+        if not hasattr(self, '_TypingBase__is_carbon'):
             self.__is_carbon = self._is_carbon()
 
         return self.__is_carbon
@@ -85,7 +90,7 @@ class TypingBase(object):
 
     @property
     def is_nitrogen(self):
-        if not hasattr(self, '__is_nitrogen'):
+        if not hasattr(self, '_TypingBase__is_nitrogen'):
             self.__is_nitrogen = self._is_nitrogen()
 
         return self. __is_nitrogen
@@ -97,7 +102,7 @@ class TypingBase(object):
 
     @property
     def is_oxygen(self):
-        if not hasattr(self, '__is_oxygen'):
+        if not hasattr(self, '_TypingBase__is_oxygen'):
             self.__is_oxygen = self._is_oxygen()
 
         return self. __is_oxygen
@@ -109,7 +114,7 @@ class TypingBase(object):
 
     @property
     def is_sulfur(self):
-        if not hasattr(self, '__is_sulfur'):
+        if not hasattr(self, '_TypingBase__is_sulfur'):
             self.__is_sulfur = self._is_sulfur()
 
         return self.__is_sulfur
@@ -121,7 +126,7 @@ class TypingBase(object):
 
     @property
     def is_phosphorus(self):
-        if not hasattr(self, '__is_phosphorus'):
+        if not hasattr(self, '_TypingBase__is_phosphorus'):
             self.__is_phosphorus = self._is_phosphorus()
 
         return self.__is_phosphorus
@@ -133,7 +138,7 @@ class TypingBase(object):
 
     @property
     def is_fluorine(self):
-        if not hasattr(self, '__is_fluorine'):
+        if not hasattr(self, '_TypingBase__is_fluorine'):
             self.__is_fluorine = self._is_fluorine()
 
         return self.__is_fluorine
@@ -145,7 +150,7 @@ class TypingBase(object):
 
     @property
     def is_chlorine(self):
-        if not hasattr(self, '__is_chlorine'):
+        if not hasattr(self, '_TypingBase__is_chlorine'):
             self.__is_chlorine = self._is_chlorine()
 
         return self.__is_chlorine
@@ -157,7 +162,7 @@ class TypingBase(object):
 
     @property
     def is_bromine(self):
-        if not hasattr(self, '__is_chlorine'):
+        if not hasattr(self, '_TypingBase__is_bromine'):
             self.__is_bromine = self._is_bromine()
 
         return self.__is_bromine
@@ -168,7 +173,7 @@ class TypingBase(object):
             tf.constant(8, dtype=tf.int64))
     @property
     def is_iodine(self):
-        if not hasattr(self, '__is_iodine'):
+        if not hasattr(self, '_TypingBase__is_iodine'):
             self.__is_iodine = self._is_iodine()
 
         return self.__is_iodine
@@ -181,7 +186,7 @@ class TypingBase(object):
 
     @property
     def is_hydrogen(self):
-        if not hasattr(self, '__is_hydrogen'):
+        if not hasattr(self, '_TypingBase__is_hydrogen'):
             self.__is_hydrogen = self._is_hydrogen()
 
         return self.__is_hydrogen
@@ -194,7 +199,7 @@ class TypingBase(object):
 
     @property
     def is_heavy(self):
-        if not hasattr(self, '__is_heavy'):
+        if not hasattr(self, '_TypingBase__is_heavy'):
             self.__is_heavy = self._is_heavy()
 
         return self.__is_heavy
@@ -216,7 +221,7 @@ class TypingBase(object):
 
     @property
     def is_sp1(self):
-        if not hasattr(self, '__is_sp1'):
+        if not hasattr(self, '_TypingBase__is_sp1'):
             self.__is_sp1 = self._is_sp1()
 
         return self.__is_sp1
@@ -238,7 +243,7 @@ class TypingBase(object):
 
     @property
     def is_sp2(self):
-        if not hasattr(self, '__is_sp2'):
+        if not hasattr(self, '_TypingBase__is_sp2'):
             self.__is_sp2 = self._is_sp2()
 
         return self.__is_sp2
@@ -251,7 +256,7 @@ class TypingBase(object):
                 axis=0)
     @property
     def is_sp3(self):
-        if not hasattr(self, '__is_sp3'):
+        if not hasattr(self, '_TypingBase__is_sp3'):
             self.__is_sp3 = self._is_sp3()
 
         return self.__is_sp3
@@ -270,7 +275,7 @@ class TypingBase(object):
 
     @property
     def is_connected_to_oxygen(self):
-        if not hasattr(self, '__is_connected_to_oxygen'):
+        if not hasattr(self, '_TypingBase__is_connected_to_oxygen'):
             self.__is_connected_to_oxygen = self._is_connected_to_oxygen()
 
         return self.__is_connected_to_oxygen
@@ -288,7 +293,7 @@ class TypingBase(object):
 
     @property
     def is_connected_to_sulfur(self):
-        if not hasattr(self, '__is_connected_to_sulfur'):
+        if not hasattr(self, '_TypingBase__is_connected_to_sulfur'):
             self.__is_connected_to_sulfur = self._is_connected_to_sulfur()
 
         return self.__is_connected_to_sulfur
@@ -305,7 +310,7 @@ class TypingBase(object):
 
     @property
     def is_connected_to_carbon(self):
-        if not hasattr(self, '__is_connected_to_carbon'):
+        if not hasattr(self, '_TypingBase__is_connected_to_carbon'):
             self.__is_connected_to_carbon \
                 = self._is_connected_to_carbon()
 
@@ -326,7 +331,7 @@ class TypingBase(object):
 
     @property
     def is_connected_to_sp1_carbon(self):
-        if not hasattr(self, '__is_connected_to_sp1_carbon'):
+        if not hasattr(self, '_TypingBase__is_connected_to_sp1_carbon'):
             self.__is_connected_to_sp1_carbon \
                 = self._is_connected_to_sp1_carbon()
 
@@ -347,7 +352,7 @@ class TypingBase(object):
 
     @property
     def is_connected_to_sp2_carbon(self):
-        if not hasattr(self, '__is_connected_to_sp2_carbon'):
+        if not hasattr(self, '_TypingBase__is_connected_to_sp2_carbon'):
             self.__is_connected_to_sp2_carbon \
                 = self._is_connected_to_sp2_carbon()
 
@@ -368,7 +373,7 @@ class TypingBase(object):
 
     @property
     def is_connected_to_sp3_carbon(self):
-        if not hasattr(self, '__is_connected_to_sp3_carbon'):
+        if not hasattr(self, '_TypingBase__is_connected_to_sp3_carbon'):
             self.__is_connected_to_sp3_carbon \
                 = self._is_connected_to_sp3_carbon()
 
@@ -386,7 +391,7 @@ class TypingBase(object):
 
     @property
     def is_connected_to_nitrogen(self):
-        if not hasattr(self, '__is_connected_to_nitrogen'):
+        if not hasattr(self, '_TypingBase__is_connected_to_nitrogen'):
             self.__is_connected_to_nitrogen \
                 = self._is_connected_to_nitrogen()
 
@@ -404,7 +409,7 @@ class TypingBase(object):
 
     @property
     def is_connected_to_phosphorus(self):
-        if not hasattr(self, '__is_connected_to_phosphorus'):
+        if not hasattr(self, '_TypingBase__is_connected_to_phosphorus'):
             self.__is_connected_to_phosphorus \
                 = self._is_connected_to_phosphorus()
 
@@ -470,7 +475,7 @@ class TypingBase(object):
 
     @property
     def has_1_hydrogen(self):
-        if not hasattr(self, '__has_1_hydrogen'):
+        if not hasattr(self, '_TypingBase__has_1_hydrogen'):
             self.__has_1_hydrogen \
                 = self._has_1_hydrogen()
 
@@ -511,7 +516,7 @@ class TypingBase(object):
 
     @property
     def has_2_hydrogen(self):
-        if not hasattr(self, '__has_2_hydrogen'):
+        if not hasattr(self, '_TypingBase__has_2_hydrogen'):
             self.__has_2_hydrogen \
                 = self._has_2_hydrogen()
 
@@ -526,25 +531,52 @@ class TypingBase(object):
 
     @property
     def has_3_hydrogen(self):
-        if not hasattr(self, '__has_3_hydrogen'):
+        if not hasattr(self, '_TypingBase__has_3_hydrogen'):
             self.__has_3_hydrogen \
                 = self._has_3_hydrogen()
 
         return self.__has_3_hydrogen
 
+    # the number of heavy neighbors,
+    # shared by all the `is_connected_to_{k}_heavy` checks
+    # so that the adjacency map is only reduced once
+    def _n_heavy_neighbors(self):
+        return tf.math.count_nonzero(
+            tf.boolean_mask(
+                self.adjacency_map_full,
+                self.is_heavy,
+                axis=1),
+            axis=1)
+
+    @property
+    def n_heavy_neighbors(self):
+        if not hasattr(self, '_TypingBase__n_heavy_neighbors'):
+            self.__n_heavy_neighbors = self._n_heavy_neighbors()
+
+        return self.__n_heavy_neighbors
+
+    # the number of neighbors,
+    # shared by all the `is_connected_to_{k}` checks
+    def _n_neighbors(self):
+        return tf.math.count_nonzero(
+            self.adjacency_map_full,
+            axis=0)
+
+    @property
+    def n_neighbors(self):
+        if not hasattr(self, '_TypingBase__n_neighbors'):
+            self.__n_neighbors = self._n_neighbors()
+
+        return self.__n_neighbors
+
     def _is_connected_to_1_heavy(self):
         return tf.equal(
-            tf.math.count_nonzero(
-                tf.boolean_mask(
-                    self.adjacency_map_full,
-                    self.is_heavy,
-                    axis=1),
-                axis=1),
+            self.n_heavy_neighbors,
             tf.constant(1, dtype=tf.int64))
 
     @property
     def is_connected_to_1_heavy(self):
-        if not hasattr(self, '__is_connected_to_1_heavy'):
+        if not hasattr(self, '_TypingBase__is_connected_to_1_heavy'):
             self.__is_connected_to_1_heavy \
                 = self._is_connected_to_1_heavy()
 
@@ -552,14 +584,12 @@ class TypingBase(object):
 
     def _is_connected_to_1(self):
         return tf.equal(
-            tf.math.count_nonzero(
-                self.adjacency_map_full,
-                axis=0),
+            self.n_neighbors,
             tf.constant(1, dtype=tf.int64))
 
     @property
     def is_connected_to_1(self):
-        if not hasattr(self, '__is_connected_to_1'):
+        if not hasattr(self, '_TypingBase__is_connected_to_1'):
             self.__is_connected_to_1 \
                 = self._is_connected_to_1()
 
@@ -567,17 +597,12 @@ class TypingBase(object):
 
     def _is_connected_to_2_heavy(self):
         return tf.equal(
-            tf.math.count_nonzero(
-                tf.boolean_mask(
-                    self.adjacency_map_full,
-                    self.is_heavy,
-                    axis=1),
-                axis=1),
+            self.n_heavy_neighbors,
             tf.constant(2, dtype=tf.int64))
 
     @property
     def is_connected_to_2_heavy(self):
-        if not hasattr(self, '__is_connected_to_2_heavy'):
+        if not hasattr(self, '_TypingBase__is_connected_to_2_heavy'):
             self.__is_connected_to_2_heavy \
                 = self._is_connected_to_2_heavy()
 
@@ -585,14 +610,12 @@ class TypingBase(object):
 
     def _is_connected_to_2(self):
         return tf.equal(
-            tf.math.count_nonzero(
-                self.adjacency_map_full,
-                axis=0),
+            self.n_neighbors,
             tf.constant(2, dtype=tf.int64))
 
     @property
     def is_connected_to_2(self):
-        if not hasattr(self, '__is_connected_to_2'):
+        if not hasattr(self, '_TypingBase__is_connected_to_2'):
             self.__is_connected_to_2 \
                 = self._is_connected_to_2()
 
@@ -600,17 +623,12 @@ class TypingBase(object):
 
     def _is_connected_to_3_heavy(self):
         return tf.equal(
-            tf.math.count_nonzero(
-                tf.boolean_mask(
-                    self.adjacency_map_full,
-                    self.is_heavy,
-                    axis=1),
-                axis=1),
+            self.n_heavy_neighbors,
             tf.constant(3, dtype=tf.int64))
 
     @property
     def is_connected_to_3_heavy(self):
-        if not hasattr(self, '__is_connected_to_3_heavy'):
+        if not hasattr(self, '_TypingBase__is_connected_to_3_heavy'):
             self.__is_connected_to_3_heavy \
                 = self._is_connected_to_3_heavy()
 
@@ -618,14 +636,12 @@ class TypingBase(object):
 
     def _is_connected_to_3(self):
         return tf.equal(
-            tf.math.count_nonzero(
-                self.adjacency_map_full,
-                axis=0),
+            self.n_neighbors,
             tf.constant(3, dtype=tf.int64))
 
     @property
     def is_connected_to_3(self):
-        if not hasattr(self, '__is_connected_to_3'):
+        if not hasattr(self, '_TypingBase__is_connected_to_3'):
             self.__is_connected_to_3 \
                 = self._is_connected_to_3()
 
@@ -633,17 +649,12 @@ class TypingBase(object):
 
     def _is_connected_to_4_heavy(self):
         return tf.equal(
-            tf.math.count_nonzero(
-                tf.boolean_mask(
-                    self.adjacency_map_full,
-                    self.is_heavy,
-                    axis=1),
-                axis=1),
+            self.n_heavy_neighbors,
             tf.constant(4, dtype=tf.int64))
 
     @property
     def is_connected_to_4_heavy(self):
-        if not hasattr(self, '__is_connected_to_4_heavy'):
+        if not hasattr(self, '_TypingBase__is_connected_to_4_heavy'):
             self.__is_connected_to_4_heavy \
                 = self._is_connected_to_4_heavy()
 
@@ -651,14 +662,12 @@ class TypingBase(object):
 
     def _is_connected_to_4(self):
         return tf.equal(
-            tf.math.count_nonzero(
-                self.adjacency_map_full,
-                axis=0),
+            self.n_neighbors,
             tf.constant(4, dtype=tf.int64))
 
     @property
     def is_connected_to_4(self):
-        if not hasattr(self, '__is_connected_to_4'):
+        if not hasattr(self, '_TypingBase__is_connected_to_4'):
             self.__is_connected_to_4 \
                 = self._is_connected_to_4()
 
@@ -884,7 +893,7 @@ class TypingBase(object):
 
     @property
     def is_in_ring(self):
-        if not hasattr(self, '__is_in_ring'):
+        if not hasattr(self, '_TypingBase__is_in_ring'):
             self.__is_in_ring = self._is_in_ring()
 
         return self.__is_in_ring
@@ -1153,7 +1162,7 @@ class TypingBase(object):
 
     @property
     def is_in_conjugate_system(self):
-        if not hasattr(self, '__is_in_conjugate_system'):
+        if not hasattr(self, '_TypingBase__is_in_conjugate_system'):
             self.__is_in_conjugate_system = self._is_in_conjugate_system()
 
         return self.__is_in_conjugate_system
@@ -1442,7 +1451,7 @@ class TypingBase(object):
 
     @property
     def is_aromatic(self):
-        if not hasattr(self, '__is_aromatic'):
+        if not hasattr(self, '_TypingBase__is_aromatic'):
             self.__is_aromatic = self._is_aromatic()
 
         return self.__is_aromatic
@@ -1459,7 +1468,7 @@ class TypingBase(object):
 
     @property
     def is_connected_to_aromatic(self):
-        if not hasattr(self, '__is_connected_to_aromatic'):
+        if not hasattr(self, '_TypingBase__is_connected_to_aromatic'):
             self.__is_connected_to_aromatic \
                 = self._is_connected_to_aromatic()
 
@@ -36,10 +36,15 @@ SOFTWARE.
 # imports
 # =============================================================================
 # dependencies
-import tensorflow as tf
-# tf.enable_eager_execution()
 import os
+# NOTE: this is read when TensorFlow is imported,
+#       so it has to be set before the import
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+import tensorflow as tf
+# tf.enable_eager_execution()
+import numpy as np
+import re
+import functools
 import multiprocessing
 N_CPUS = multiprocessing.cpu_count()
 
@@ -139,15 +144,88 @@ N_ATOM_COUNTER_STR = '|'.join(
     '@',
     'H',
     '\/',
-    r'\\'
+    r'\\',
+    '-'
 ])
 
-dummy_list = []
+# tokens of a SMILES string, for the python parser.
+# NOTE: each kind of token is a named group,
+#       so the regex engine classifies the token
+#       and the parser only dispatches on `match.lastgroup`;
+#       anything else, e.g. `.`, `%10`, falls into `unknown`
+#       so that it is rejected rather than skipped
+SMILES_TOKEN_REGEX = re.compile(
+    r'(?P<bracket_atom>\[[^\]]*\])'
+    r'|(?P<atom>Br|Cl|[A-Za-z])'
+    r'|(?P<bond>[-=#:])'
+    r'|(?P<branch_open>\()'
+    r'|(?P<branch_close>\))'
+    r'|(?P<ring>\d)'
+    r'|(?P<stereo>[/\\])'
+    r'|(?P<unknown>.)',
+    re.DOTALL)
+
+# the bracket atoms we support,
+# e.g. `[C@@H]`, `[nH]`, `[13CH3]`,
+# with the full element symbol captured.
+# NOTE: charges and atom classes are not supported
+BRACKET_ATOM_REGEX = re.compile(
+    r'\[\d*(?P<element>[A-Z][a-z]?|[a-z]{1,2})@*(?:H\d*)?\]')
+
+ATOM_IDXS = {
+    'C': 0,
+    'c': 0,
+    'N': 1,
+    'n': 1,
+    'O': 2,
+    'o': 2,
+    'S': 3,
+    's': 3,
+    'P': 4,
+    'p': 4,
+    'F': 5,
+    'Cl': 6,
+    'Br': 7,
+    'I': 8
+}
+
+# atom idxs looked up by character code,
+# with `Br` and `Cl` already shortened to `R` and `L`.
+# used by the tensorflow parser
+ATOM_IDXS_BY_ORD = [-1] * 128
+for _atom, _idx in ATOM_IDXS.items():
+    ATOM_IDXS_BY_ORD[ord(_atom.replace('Br', 'R').replace('Cl', 'L'))] = _idx
+
+# NOTE: sulfur is not marked as aromatic
+AROMATIC_ATOMS = ['c', 'n', 'o', 'p']
+
+# aromatic flags looked up by character code.
+# used by the tensorflow parser
+IS_AROMATIC_BY_ORD = [False] * 128
+for _atom in AROMATIC_ATOMS:
+    IS_AROMATIC_BY_ORD[ord(_atom)] = True
+
+BOND_ORDERS = {
+    '-': 1.0,
+    '=': 2.0,
+    '#': 3.0,
+    ':': 1.0,
+}
+
+# number of molecules remembered by `to_mol`.
+# NOTE: a drug-sized molecule takes a few KiB,
+#       so the cache stays within a few hundred MiB
+MOL_CACHE_SIZE = 2 ** 16
 
 # =============================================================================
 # utility functions
 # =============================================================================
-# @tf.function
+# NOTE: traced once for a scalar string,
+#       so that SMILES strings of all lengths share the same graph
+@tf.function(
+    input_signature=[
+        tf.TensorSpec(shape=[], dtype=tf.string)],
+    autograph=False)
 def smiles_to_organic_topological_molecule(smiles):
     """ Decode a SMILES string to a molecule object.
 
@@ -161,6 +239,9 @@ def smiles_to_organic_topological_molecule(smiles):
           parse a small molecule, with no flags and assertions whatsoever.
           we assume the validity of the smiles string.
 
+    NOTE: `parse_smiles` is the reference parser;
+          see there for the ring closures this one gets wrong.
+
     Parameters
     ----------
     smiles : str,
@@ -171,26 +252,17 @@ def smiles_to_organic_topological_molecule(smiles):
     molecule : molecule.Molecule object.
     """
 
-    with tf.init_scope(): # register the variables
-        # it is still eager environment here
-        # we need to get:
-        #     - number of atoms
-        #     - number of brackets
+    # strip it
+    smiles = tf.strings.strip(smiles)
 
-        # strip it
-        smiles = tf.strings.strip(smiles)
-
-        # get the total length
-        length = tf.strings.length(smiles)
-
-        # get the number of atoms
-        n_atoms = tf.cast(
-            tf.strings.length(
-                tf.strings.regex_replace(
-                    smiles,
-                    N_ATOM_COUNTER_STR,
-                    '')),
-            tf.int64)
+    # get the number of atoms
+    n_atoms = tf.cast(
+        tf.strings.length(
+            tf.strings.regex_replace(
+                smiles,
+                N_ATOM_COUNTER_STR,
+                '')),
+        tf.int64)
 
     # initialize the adjacency map
     # the adjaceny map, by default,
@@ -211,12 +283,9 @@ def smiles_to_organic_topological_molecule(smiles):
     # of an identity matrix with one more column & row
 
     # (n_atoms, n_atoms)
-    adjacency_map = tf.Variable(
-        lambda: tf.eye(
-            n_atoms + 1,
-            dtype=tf.float32)[1:, :-1]) # to enable aromatic bonds
-
-    dummy_list.append(adjacency_map)
+    adjacency_map = tf.eye(
+        n_atoms + 1,
+        dtype=tf.float32)[1:, :-1] # to enable aromatic bonds
 
 
     # ==========================
@@ -237,11 +306,10 @@ def smiles_to_organic_topological_molecule(smiles):
     smiles = tf.strings.regex_replace(
         smiles, '\[nH\]', 'n')
 
+    # remove stereochemistry of the bonds,
+    # and explicit single bonds, which are the default
     smiles = tf.strings.regex_replace(
-        smiles, '\/', '')
-
-    smiles = tf.strings.regex_replace(
-        smiles, r'\\', '')
+        smiles, r'/|\\|-', '')
 
     # get rid of all the topology chrs
     # in order to get the atoms
@@ -250,84 +318,28 @@ def smiles_to_organic_topological_molecule(smiles):
         ALL_TOPOLOGY_REGEX_STR,
         '')
 
-    smiles_aromatic = tf.strings.regex_replace(
-        smiles_atoms_only,
-        'c|n|o|p',
-        'A')
-
     # =================================
     # translate atoms notations to idxs
     # =================================
-    # right now to depend on tf.strings to achieve this
-    # TODO: further optimize this bit
-
-    # carbon
-    # aromatic or not
-    smiles_atoms_only = tf.strings.regex_replace(
-        smiles_atoms_only,
-        'C|c',
-        '0')
-
-    # nitrogen
-    # aromatic or not
-    smiles_atoms_only = tf.strings.regex_replace(
-        smiles_atoms_only,
-        'N|n',
-        '1')
-
-    # oxygen
-    # aromatic or not
-    smiles_atoms_only = tf.strings.regex_replace(
-        smiles_atoms_only,
-        'O|o',
-        '2')
-
-    # sulfur
-    # aromatic or not
-    smiles_atoms_only = tf.strings.regex_replace(
-        smiles_atoms_only,
-        'S|s',
-        '3')
-
-    # phosphorus
-    # aromatic or not
-    smiles_atoms_only = tf.strings.regex_replace(
-        smiles_atoms_only,
-        'P|p', # NOTE: although not common, adding this doesn't hurt speed
-        '4')
-
-    # fluorine
-    smiles_atoms_only = tf.strings.regex_replace(
-        smiles_atoms_only,
-        'F',
-        '5')
-
-    # chlorine
-    smiles_atoms_only = tf.strings.regex_replace(
-        smiles_atoms_only,
-        'L',
-        '6')
-
-    # bromine
-    smiles_atoms_only = tf.strings.regex_replace(
-        smiles_atoms_only,
-        'R',
-        '7')
-
-    # iodine
-    smiles_atoms_only = tf.strings.regex_replace(
-        smiles_atoms_only,
-        'I',
-        '8')
-
-    # split it in order to convert to tf.Tensor with dtype=tf.int64
-    atoms = tf.strings.bytes_split(
-        smiles_atoms_only) # NOTE: add values here because this is suppose to be sparse
+    # look up the index of each character in one pass,
+    # rather than substituting the atoms one by one
+    smiles_atoms_only = tf.cast(
+        tf.io.decode_raw(
+            smiles_atoms_only,
+            tf.uint8),
+        tf.int64)
 
+    atoms = tf.gather(
+        tf.constant(ATOM_IDXS_BY_ORD, dtype=tf.int64),
+        smiles_atoms_only)
 
-    atoms = tf.strings.to_number(
-        atoms,
-        tf.int64) # NOTE: int64 to be compatible
+    # characters that are not atoms we support, e.g. `.`, `%`, `B`,
+    # are left as -1 by the lookup
+    with tf.control_dependencies([
+            tf.debugging.assert_non_negative(
+                atoms,
+                message='unsupported character in SMILES string')]):
+        atoms = tf.identity(atoms)
 
 
     # ==============================
@@ -338,16 +350,17 @@ def smiles_to_organic_topological_molecule(smiles):
         ALL_ORGANIC_ATOMS_STR,
         '0')
 
-    # split it into array
-    smiles_topology_only = tf.strings.bytes_split(
-        smiles_topology_only)
+    # split it into an array of character codes
+    smiles_topology_only = tf.io.decode_raw(
+        smiles_topology_only,
+        tf.uint8)
 
     # find all the indices and characters indicating topology
     topology_idxs = tf.reshape(
         tf.where(
             tf.not_equal(
                 smiles_topology_only,
-                '0')),
+                tf.constant(ord('0'), dtype=tf.uint8))),
         [-1])
 
     topology_chrs = tf.gather(
@@ -376,59 +389,38 @@ def smiles_to_organic_topological_molecule(smiles):
     #       to multiple bonds
     # double bonds and triple bonds
     # modify the bond order to two or three
-    double_bond_idxs = tf.gather(
-        topology_idxs,
-        tf.reshape(
-            tf.where(
-                tf.equal(
-                    topology_chrs,
-                    '=')),
-            [-1]))
+    is_double_bond = tf.equal(
+        topology_chrs,
+        tf.constant(ord('='), dtype=tf.uint8))
+
+    is_multiple_bond = tf.logical_or(
+        is_double_bond,
+        tf.equal(
+            topology_chrs,
+            tf.constant(ord('#'), dtype=tf.uint8)))
 
-    triple_bond_idxs = tf.gather(
+    multiple_bond_idxs = tf.boolean_mask(
         topology_idxs,
-        tf.reshape(
-            tf.where(
-                tf.equal(
-                    topology_chrs,
-                    '#')),
-            [-1]))
+        is_multiple_bond)
 
-    # update double bonds
-    # (n_atoms, n_atoms)
-    adjacency_map.scatter_nd_update(
-        tf.transpose(
-            tf.concat(
-                [
-                    tf.expand_dims(
-                        double_bond_idxs,
-                        0),
-                    tf.expand_dims(
-                        double_bond_idxs + 1,
-                        0)
-                ],
-                axis=0)),
-        tf.ones_like(
-            double_bond_idxs,
-            dtype=tf.float32) * 2)
+    multiple_bond_orders = tf.where(
+        tf.boolean_mask(
+            is_double_bond,
+            is_multiple_bond),
+        2 * tf.ones_like(multiple_bond_idxs, dtype=tf.float32),
+        3 * tf.ones_like(multiple_bond_idxs, dtype=tf.float32))
 
-    # update triple bonds
+    # update double and triple bonds at once
     # (n_atoms, n_atoms)
-    adjacency_map.scatter_nd_update(
-        tf.transpose(
-            tf.concat(
-                [
-                    tf.expand_dims(
-                        triple_bond_idxs,
-                        0),
-                tf.expand_dims(
-                    triple_bond_idxs + 1,
-                    0)
-                ],
-                axis=0)),
-        tf.ones_like(
-            triple_bond_idxs,
-            dtype=tf.float32) * 3)
+    adjacency_map = tf.tensor_scatter_nd_update(
+        adjacency_map,
+        tf.stack(
+            [
+                multiple_bond_idxs,
+                multiple_bond_idxs + 1
+            ],
+            axis=1),
+        multiple_bond_orders)
 
     # ========
     # branches
@@ -443,28 +435,47 @@ def smiles_to_organic_topological_molecule(smiles):
     # init a queue
     bracket_queue = tf.constant([], dtype=tf.int64)
 
-    # get a large matrix to record the pairs
-    bracket_pairs = tf.constant(
-        [[-1, -1]],
+    # record the pairs, starting with none
+    bracket_pairs = tf.zeros(
+        [0, 2],
         tf.int64)
 
-    first_right = tf.constant(True)
-    def if_left(idx, bracket_queue, bracket_pairs):
+    # the last pair of brackets closed,
+    # to handle the overlap between left and right brackets
+    # as in
+    # CCC(C)(C)CC
+    last_pair = tf.constant(
+        [-1, -1],
+        tf.int64)
+
+    def if_left(idx, bracket_queue, bracket_pairs, last_pair,
+            topology_idxs=topology_idxs):
         # if a certain position
         # it is a left bracket
-        # put that bracket in the queue
+        # put the atom left to that bracket in the queue
         # NOTE: queue is not supported in graph
         # bracket_queue.enqueue(idx)
+        left_idx = topology_idxs[idx]
+
+        # if a left bracket directly follows a right bracket,
+        # the side chain branches from the same atom as the last one
+        left_idx = tf.where(
+            tf.equal(
+                left_idx,
+                last_pair[1]),
+            last_pair[0],
+            left_idx)
+
         bracket_queue = tf.concat(
             [
                 bracket_queue,
-                [idx]
+                [left_idx]
             ],
             axis=0)
 
-        return idx, bracket_queue, bracket_pairs
+        return idx, bracket_queue, bracket_pairs, last_pair
 
-    def if_right(idx, bracket_queue, bracket_pairs,
+    def if_right(idx, bracket_queue, bracket_pairs, last_pair,
             topology_idxs=topology_idxs):
         # if at a certain position
         # it is a right bracket
@@ -472,74 +483,72 @@ def smiles_to_organic_topological_molecule(smiles):
         #   - get a left bracket out of the queue
         #   - modify the adjacency matrix
         right_idx = topology_idxs[idx]
-        left_idx = topology_idxs[bracket_queue[-1]]
+        left_idx = bracket_queue[-1]
         bracket_queue = bracket_queue[:-1]
+        last_pair = tf.stack([left_idx, right_idx])
         bracket_pairs = tf.concat(
             [
                 bracket_pairs,
                 tf.expand_dims(
-                    [left_idx, right_idx],
+                    last_pair,
                     axis=0)
             ],
             axis=0)
 
-        return idx, bracket_queue, bracket_pairs
+        return idx, bracket_queue, bracket_pairs, last_pair
 
-    def loop_body(idx, bracket_queue, bracket_pairs,
+    def loop_body(idx, bracket_queue, bracket_pairs, last_pair,
             topology_chrs=topology_chrs):
         # get the flag
         chr_flag = topology_chrs[idx]
 
         # if left
-        idx, bracket_queue, bracket_pairs = tf.cond(
+        idx, bracket_queue, bracket_pairs, last_pair = tf.cond(
             tf.equal(
                 chr_flag,
-                '('),
+                tf.constant(ord('('), dtype=tf.uint8)),
 
             # if chr_flag == '('
-            lambda: if_left(idx, bracket_queue, bracket_pairs),
+            lambda: if_left(idx, bracket_queue, bracket_pairs, last_pair),
 
             # else:
-            lambda: (idx, bracket_queue, bracket_pairs))
+            lambda: (idx, bracket_queue, bracket_pairs, last_pair))
 
         # if right
-        idx, bracket_queue, bracket_pairs = tf.cond(
+        idx, bracket_queue, bracket_pairs, last_pair = tf.cond(
             tf.equal(
                 chr_flag,
-                ')'),
+                tf.constant(ord(')'), dtype=tf.uint8)),
 
-            # if chr_flag == '('
-            lambda: if_right(idx, bracket_queue, bracket_pairs),
+            # if chr_flag == ')'
+            lambda: if_right(idx, bracket_queue, bracket_pairs, last_pair),
 
             # else:
-            lambda: (idx, bracket_queue, bracket_pairs))
+            lambda: (idx, bracket_queue, bracket_pairs, last_pair))
 
         # increment
-        return idx+1, bracket_queue, bracket_pairs
+        return idx+1, bracket_queue, bracket_pairs, last_pair
 
 
     # while loop
     max_iter = tf.shape(topology_idxs)[0]
     idx = tf.constant(0)
 
-    _, _, bracket_pairs = tf.while_loop(
+    _, _, bracket_pairs, _ = tf.while_loop(
         # condition
-        lambda idx, _0, _1: tf.less(idx, max_iter),
+        lambda idx, _0, _1, _2: tf.less(idx, max_iter),
 
         # body
-        lambda idx, bracket_queue, bracket_pairs: \
-            loop_body(idx, bracket_queue, bracket_pairs),
+        loop_body,
 
         # var
-        [idx, bracket_queue, bracket_pairs],
+        [idx, bracket_queue, bracket_pairs, last_pair],
 
         shape_invariants=[
             idx.get_shape(),
             tf.TensorShape([None, ]),
-            tf.TensorShape([None, 2])])
-
-    # get rid of the first row
-    bracket_pairs = bracket_pairs[1:, ]
+            tf.TensorShape([None, 2]),
+            last_pair.get_shape()])
 
     # split into left and right brackets
     left_bracket_idxs = bracket_pairs[:, 0]
@@ -554,53 +563,7 @@ def smiles_to_organic_topological_molecule(smiles):
                 right_bracket_idxs,
                 n_atoms - 1)))
 
-    left_bracket_idxs = left_bracket_idxs[:right_bracket_idxs.shape[0]]
-
-    # handle the overlap between left and right brackets
-    # as in
-    # CCC(C)(C)CC
-    left_right_overlaps = tf.where(
-        tf.equal(
-            tf.subtract(
-                tf.tile(
-                    tf.expand_dims(
-                        left_bracket_idxs,
-                        0),
-                    [tf.shape(right_bracket_idxs)[0], 1]),
-                tf.tile(
-                    tf.expand_dims(
-                        right_bracket_idxs,
-                        1),
-                    [1, tf.shape(right_bracket_idxs)[0]])),
-            tf.constant(0, dtype=tf.int64)))
-
-    def process_right_left_overlap(
-            idx,
-            left_bracket_idxs,
-            right_bracket_idxs=right_bracket_idxs,
-            left_right_overlaps=left_right_overlaps):
-
-        left_right_overlap = left_right_overlaps[idx, :]
-
-        left_bracket_idxs = tf.where(
-            tf.equal(
-                tf.range(
-                    tf.shape(right_bracket_idxs, tf.int64)[0]),
-                left_right_overlap[1]),
-            tf.ones_like(left_bracket_idxs) \
-                * left_bracket_idxs[left_right_overlap[0]],
-            left_bracket_idxs)
-
-        return idx + 1, left_bracket_idxs
-
-    idx = tf.constant(0, dtype=tf.int64)
-
-
-    _, left_bracket_idxs = tf.while_loop(
-        lambda idx, _: \
-            tf.less(idx, tf.shape(left_right_overlaps, tf.int64)[0]),
-        process_right_left_overlap,
-        [idx, left_bracket_idxs])
+    left_bracket_idxs = left_bracket_idxs[:tf.shape(right_bracket_idxs)[0]]
 
     current_bond_idxs = tf.transpose(
         tf.concat(
@@ -633,13 +596,15 @@ def smiles_to_organic_topological_molecule(smiles):
             axis=0))
 
     # drop the connection between right bracket and the atom right to it
-    adjacency_map.scatter_nd_update(
+    adjacency_map = tf.tensor_scatter_nd_update(
+        adjacency_map,
         current_bond_idxs,
         tf.zeros_like(current_bond_order))
 
     # connect the atom right of the right bracket to the atom left of
     # the left bracket
-    adjacency_map.scatter_nd_update(
+    adjacency_map = tf.tensor_scatter_nd_update(
+        adjacency_map,
         new_bond_idxs,
         current_bond_order)
 
@@ -660,22 +625,26 @@ def smiles_to_organic_topological_molecule(smiles):
     idx = tf.constant(0, dtype=tf.int64)
     max_iter = tf.constant(5, dtype=tf.int64)
     connection_chrs = tf.constant([
-        '1',
-        '2',
-        '3',
-        '4',
-        '5',
-        '6'
-    ], dtype=tf.string)
-
-    # init bond indices and orders
-    bond_idxs_to_update = tf.constant([[-1, -1]], dtype=tf.int64)
-    bond_orders_to_update = tf.constant([-1], dtype=tf.float32)
+        ord('1'),
+        ord('2'),
+        ord('3'),
+        ord('4'),
+        ord('5'),
+        ord('6')
+    ], dtype=tf.uint8)
+
+    # init bond indices,
+    # one element of pairs for each ring digit
+    bond_idxs_to_update = tf.TensorArray(
+        tf.int64,
+        size=0,
+        dynamic_size=True,
+        infer_shape=False,
+        element_shape=tf.TensorShape([None, 2]))
 
     def loop_body(
             idx,
             bond_idxs_to_update,
-            bond_orders_to_update,
             connection_chrs=connection_chrs):
 
         # get the connection character
@@ -692,110 +661,88 @@ def smiles_to_organic_topological_molecule(smiles):
                         connection_chr)),
                 [-1]))
 
-        # handle the situation where there is more than one atoms connected
-        # to the center
         connection_idxs = tf.sort(connection_idxs)
 
-        # dirty stuff to get the permutations
-        connection_idxs_x, connection_idxs_y = tf.meshgrid(
-            connection_idxs,
-            connection_idxs)
-
-        connection_idxs_stack = tf.stack(
-            [
-                connection_idxs_x,
-                connection_idxs_y
-            ],
-            axis=2)
-
         # count the number of connections
         n_connections = tf.shape(connection_idxs)[0]
-        n_connections_bonds = tf.math.divide(
-            n_connections * (n_connections - 1),
-            2)
-
-        tf.where(
-                tf.equal(
-                    tf.linalg.band_part(
-                        tf.ones((n_connections, n_connections),
-                            dtype=tf.int64),
-                        0, -1),
-                    tf.constant(0, dtype=tf.int64)))
-
-        connection_idxs = tf.gather_nd(
-            connection_idxs_stack,
-            tf.where(
-                    tf.equal(
-                        tf.linalg.band_part(
-                            tf.ones((n_connections, n_connections),
-                                dtype=tf.int64),
-                            0, -1),
-                        tf.constant(0, dtype=tf.int64))))
 
-        bond_idxs_to_update = tf.concat(
-            [
-                bond_idxs_to_update,
+        def all_pairs(connection_idxs=connection_idxs):
+            # handle the situation where there is more than one atoms
+            # connected to the center
+            # dirty stuff to get the permutations
+            connection_idxs_x, connection_idxs_y = tf.meshgrid(
                 connection_idxs,
-            ],
-            axis=0)
+                connection_idxs)
 
-        bond_orders_to_update = tf.cond(
-            tf.greater(
-                tf.shape(connection_idxs)[0],
-                0),
-
-            lambda: tf.concat(
+            connection_idxs_stack = tf.stack(
                 [
-                    bond_orders_to_update,
-                    tf.ones(
-                        (tf.shape(connection_idxs)[0], ),
-                        dtype=tf.float32)
+                    connection_idxs_x,
+                    connection_idxs_y
                 ],
-                axis=0),
+                axis=2)
 
-            lambda: bond_orders_to_update)
-
-        # increment
-        return idx + 1, bond_idxs_to_update, bond_orders_to_update
+            return tf.gather_nd(
+                connection_idxs_stack,
+                tf.where(
+                        tf.equal(
+                            tf.linalg.band_part(
+                                tf.ones((n_connections, n_connections),
+                                    dtype=tf.int64),
+                                0, -1),
+                            tf.constant(0, dtype=tf.int64))))
+
+        connection_idxs = tf.cond(
+            # usually a ring is closed by one pair of digits,
+            # which makes a single bond
+            tf.equal(
+                n_connections,
+                2),
 
-    idx, bond_idxs_to_update, bond_orders_to_update = tf.case(
-        [(
-            tf.greater(
-                tf.shape(topology_chrs)[0],
+            # if n_connections == 2:
+            lambda: tf.expand_dims(
+                connection_idxs,
                 0),
 
-            lambda: tf.while_loop(
-                lambda idx, _1, _2: tf.logical_and(
-                    tf.less(idx, max_iter),
-                    tf.logical_and(
-                        tf.reduce_any(
-                            tf.equal(
-                                connection_chrs[idx],
-                                topology_chrs)),
-                        tf.greater(tf.shape(topology_chrs)[0], 0))),
+            # else:
+            all_pairs)
 
-                # loop body
-                loop_body,
+        bond_idxs_to_update = bond_idxs_to_update.write(
+            tf.cast(idx, tf.int32),
+            connection_idxs)
 
-                # vars
-                [idx, bond_idxs_to_update, bond_orders_to_update],
+        # increment
+        return idx + 1, bond_idxs_to_update
+
+    # NOTE: without any topology characters,
+    #       the condition is false from the start
+    idx, bond_idxs_to_update = tf.while_loop(
+        lambda idx, _: tf.logical_and(
+            tf.less(idx, max_iter),
+            tf.reduce_any(
+                tf.equal(
+                    connection_chrs[idx],
+                    topology_chrs))),
+
+        # loop body
+        loop_body,
 
-                shape_invariants=[
-                    idx.get_shape(),
-                    tf.TensorShape([None, 2]),
-                    tf.TensorShape([None, ])],
+        # vars
+        [idx, bond_idxs_to_update],
 
-                parallel_iterations=5)
-        )],
+        parallel_iterations=5)
 
-        default=lambda: (idx, bond_idxs_to_update, bond_orders_to_update))
+    # rings are closed by single bonds
+    bond_idxs_to_update = tf.reshape(
+        bond_idxs_to_update.concat(),
+        [-1, 2])
 
-    # discard the first row
-    bond_idxs_to_update = bond_idxs_to_update[1:, ]
-    bond_orders_to_update = bond_orders_to_update[1:, ]
+    bond_orders_to_update = tf.ones(
+        (tf.shape(bond_idxs_to_update)[0], ),
+        dtype=tf.float32)
 
 
-    adjacency_map.scatter_nd_update(
+    adjacency_map = tf.tensor_scatter_nd_update(
+        adjacency_map,
         bond_idxs_to_update,
         bond_orders_to_update)
 
@@ -806,82 +753,36 @@ def smiles_to_organic_topological_molecule(smiles):
     # hard code aromaticity:
     #   where the aromatic atoms are coded as lower case letters
     # update the aromatic bond orders to half bonds
-    smiles_aromatic = tf.strings.bytes_split(
-        smiles_aromatic)
-
     # all the aromatic bonds where marked
+    is_aromatic = tf.gather(
+        tf.constant(IS_AROMATIC_BY_ORD, dtype=tf.bool),
+        smiles_atoms_only)
+
     aromatic_idxs = tf.reshape(
         tf.where(
-            tf.equal(
-                smiles_aromatic,
-                'A')),
+            is_aromatic),
         [-1])
 
     # we change the bond order of the aromatic atoms
     # to 1.5
     # now all the aromatic atoms should still be adjacent to each other
-    aromatic_adjacency_map = tf.gather(
-        tf.gather(
-            adjacency_map,
-            aromatic_idxs,
-            axis=0),
-        aromatic_idxs,
-        axis=1)
-
-    # dirty stuff to get the bond indices to update
-    aromatic_idxs_x, aromatic_idxs_y = tf.meshgrid(
-        tf.range(
-            tf.cast(
-                tf.shape(aromatic_idxs)[0],
-                tf.int64),
-            dtype=tf.int64),
-        tf.range(
-            tf.cast(
-                tf.shape(aromatic_idxs)[0],
-                tf.int64),
-            dtype=tf.int64))
-
-    aromatic_idxs_stack = tf.stack(
-        [
-            aromatic_idxs_x,
-            aromatic_idxs_y
-        ],
-        axis=2)
-
-    aromatic_idxs_2d = tf.boolean_mask(
-        aromatic_idxs_stack,
-        aromatic_adjacency_map)
-
-    current_bond_idxs = tf.reverse(
-        tf.reshape(
-            tf.gather(
-                aromatic_idxs,
-                tf.reshape(
-                    aromatic_idxs_2d,
-                    [-1])),
-            shape=tf.shape(aromatic_idxs_2d)),
-        axis=[1])
-
-    current_bond_order = tf.gather_nd(
-        adjacency_map,
-        current_bond_idxs)
-
-    modified_bond_order = tf.where( # if
+    # NOTE: if there is no bond right now, then we don't do anything
+    is_aromatic_bond = tf.logical_and(
+        tf.logical_and(
+            tf.expand_dims(
+                is_aromatic,
+                0),
+            tf.expand_dims(
+                is_aromatic,
+                1)),
         tf.greater_equal(
-            current_bond_order,
-            tf.constant(1, dtype=tf.float32)),
-
-        # if current_bond_order >= 1:
-        current_bond_order + 0.5,
-
-        # else:
-        # if there is no bond right now, then we don't do anything
-        current_bond_order)
+            adjacency_map,
+            tf.constant(1, dtype=tf.float32)))
 
-    # update adjacency_map
-    adjacency_map.scatter_nd_update(
-        current_bond_idxs,
-        modified_bond_order)
+    adjacency_map = tf.where(
+        is_aromatic_bond,
+        adjacency_map + 0.5,
+        adjacency_map)
 
     # handle conjugate systems
     adjacency_map_full = adjacency_map + tf.transpose(adjacency_map)
@@ -900,12 +801,15 @@ def smiles_to_organic_topological_molecule(smiles):
             axis=1))
 
     # also add aromatic idxs into our search
-    sp2_idxs = tf.concat(
-        [
-            sp2_idxs,
-            aromatic_idxs
-        ],
-        axis=0)
+    # NOTE: aromatic atoms with an exocyclic double bond, e.g. `c(=O)`,
+    #       are in both lists and should only be searched once
+    sp2_idxs, _ = tf.unique(
+        tf.concat(
+            [
+                sp2_idxs,
+                aromatic_idxs
+            ],
+            axis=0))
 
     # NOTE:
     # right now,
@@ -934,350 +838,358 @@ def smiles_to_organic_topological_molecule(smiles):
                         2,
                         dtype=tf.int64)))))
 
-    # gather only sp2 atoms
-    sp2_adjacency_map = tf.gather(
-        tf.gather(
-            adjacency_map_full,
-            sp2_idxs,
-            axis=0),
-        sp2_idxs,
-        axis=1)
-
-    # init conjugate_systems
-    conjugate_systems = tf.expand_dims(
-        tf.ones_like(sp2_idxs) \
-            * tf.constant(-1, dtype=tf.int64),
-        0)
-
-    # init visited flags
-    visited = tf.tile(
-        tf.expand_dims(
-            tf.constant(False),
-            0),
-        tf.expand_dims(
-            tf.shape(sp2_idxs)[0],
-            0))
-
-    def loop_body_inner(queue, visited, conjugate_system,
-            sp2_adjacency_map=sp2_adjacency_map):
-        # dequeue
-        idx = queue[-1]
-        queue = queue[:-1]
-
-        # flag the position of self
-        is_self = tf.equal(
-            tf.range(
-                tf.cast(
-                    tf.shape(sp2_adjacency_map)[0],
-                    tf.int64),
-                dtype=tf.int64),
-            idx)
-
-        # flag the neighbors
-        is_neighbors = tf.greater(
-            sp2_adjacency_map[idx, :],
-            tf.constant(0, dtype=tf.float32))
+    # gather only sp2 atoms,
+    # in one gather over the pairs of sp2 atoms
+    n_sp2 = tf.shape(sp2_idxs)[0]
 
-        # flag the neighbors that are not visited
-        is_unvisited_neighbors = tf.logical_and(
-            is_neighbors,
-            tf.logical_not(
-                visited))
-
-        # check if self is visited
-        self_is_unvisited = tf.logical_not(visited[idx])
-
-        # put self in the conjugate system if self is unvisited
-        conjugate_system = tf.cond(
-            self_is_unvisited,
+    sp2_idxs_x, sp2_idxs_y = tf.meshgrid(
+        sp2_idxs,
+        sp2_idxs,
+        indexing='ij')
 
-            # if self.is_visited
-            lambda: tf.concat( # put self into the conjugate_system
+    sp2_adjacency_map = tf.reshape(
+        tf.gather_nd(
+            adjacency_map_full,
+            tf.stack(
                 [
-                    conjugate_system,
-                    tf.expand_dims(
-                        idx,
-                        0)
+                    tf.reshape(sp2_idxs_x, [-1]),
+                    tf.reshape(sp2_idxs_y, [-1])
                 ],
-                axis=0),
-
-            # else:
-            lambda: conjugate_system)
-
-        # get the states of the neighbors
-        neighbors_unvisited = tf.boolean_mask(
-            tf.range(
-                tf.cast(
-                    tf.shape(sp2_adjacency_map)[0],
-                    tf.int64),
-                dtype=tf.int64),
-            is_unvisited_neighbors)
-
-        # append the undiscovered neighbors to the conjugate system
-        conjugate_system = tf.concat(
-            [
-                conjugate_system,
-                neighbors_unvisited
-            ],
-            axis=0)
+                axis=1)),
+        [n_sp2, n_sp2])
+
+    # find the connected sp2 atoms
+    # by propagating the smallest label among the neighbors
+    # until nothing changes.
+    # this takes as many steps as the longest path in a system,
+    # each of which is vectorized over all the sp2 atoms
+
+    is_connected = tf.logical_or(
+        tf.greater(
+            sp2_adjacency_map,
+            tf.constant(0, dtype=tf.float32)),
+        tf.cast(
+            tf.eye(n_sp2),
+            tf.bool))
+
+    def propagate_labels(labels, is_changed,
+            is_connected=is_connected):
+        new_labels = tf.reduce_min(
+            tf.where(
+                is_connected,
+                tf.tile(
+                    tf.expand_dims(
+                        labels,
+                        0),
+                    [n_sp2, 1]),
+                n_sp2),
+            axis=1)
 
-        # enqueue
-        queue = tf.concat(
-            [
-                queue,
-                neighbors_unvisited
-            ],
-            axis=0)
+        return new_labels, tf.reduce_any(
+            tf.not_equal(
+                new_labels,
+                labels))
 
-        # change the visited flag
-        visited = tf.where(
-            tf.logical_or(
-                is_unvisited_neighbors,
-                is_self),
+    system_labels, _ = tf.while_loop(
+        # while labels are changing
+        lambda labels, is_changed: is_changed,
 
-            # if sp2_atom is neighbor and is unvisited:
-            tf.tile(
-                tf.expand_dims(
-                    tf.constant(True),
-                    0),
-                tf.expand_dims(
-                    tf.shape(is_unvisited_neighbors)[0],
-                    0)),
+        # loop body
+        propagate_labels,
 
-            # else:
-            visited)
-
-        return queue, visited, conjugate_system
-
-    def loop_body_outer(
-            conjugate_systems,
-            visited,
-            sp2_adjacency_map=sp2_adjacency_map):
-
-        # start with the first element that's not visited
-        queue = tf.expand_dims(
-            tf.boolean_mask(
-                tf.range(
-                    tf.cast(
-                        tf.shape(sp2_adjacency_map)[0],
-                        tf.int64),
-                    dtype=tf.int64),
-                tf.logical_not(visited))[0],
-            0)
-
-        # init conjugate system
-        conjugate_system = tf.constant([], dtype=tf.int64)
-
-        queue, visited, conjugate_system = tf.while_loop(
-            # while len(queue) > 0:
-            lambda queue, visited, conjugate_system: tf.greater(
-                tf.shape(queue)[0],
-                tf.constant(0, tf.int32)),
-
-            # execute inner loop body
-            loop_body_inner,
-
-            # loop var
-            [queue, visited, conjugate_system],
-
-            shape_invariants=[
-                tf.TensorShape([None, ]),
-                tf.TensorShape(visited.get_shape()),
-                tf.TensorShape([None, ])])
-
-        conjugate_system = tf.cond(
-            # check if there are at least three atoms in the conjugate system
+        # loop var
+        # NOTE: the labels and the system idxs are int32,
+        #       which halves the tiled labels above
+        [tf.range(n_sp2), tf.constant(True)])
+
+    # number the systems,
+    # so that every sp2 atom has the idx of its system
+    systems, system_idxs = tf.unique(
+        system_labels)
+
+    n_systems = tf.shape(systems)[0]
+
+    system_sizes = tf.math.unsorted_segment_sum(
+        tf.ones_like(system_idxs),
+        system_idxs,
+        n_systems)
+
+    # the system of every atom,
+    # and -1 for the atoms not in a system of at least three atoms
+    atom_system_idxs = tf.tensor_scatter_nd_update(
+        -tf.ones((n_atoms, ), dtype=tf.int32),
+        tf.expand_dims(
+            sp2_idxs,
+            1),
+        tf.where(
             tf.greater_equal(
-                tf.shape(conjugate_system)[0],
+                tf.gather(
+                    system_sizes,
+                    system_idxs),
                 tf.constant(3, dtype=tf.int32)),
+            system_idxs,
+            -tf.ones_like(system_idxs)))
 
-            # if there is more than three atoms in the conjugate system:
-            lambda: conjugate_system,
-
-            # else:
-            lambda: tf.constant([], dtype=tf.int64))
-
-        # pad it with -1
-        conjugate_system = tf.concat(
-            [
-                conjugate_system,
-                tf.ones(tf.shape(sp2_idxs)[0] \
-                    - tf.shape(conjugate_system)[0],
-                    dtype=tf.int64) \
-                    * tf.constant(-1, dtype=tf.int64)
-            ],
-            axis=0)
-
-        # put conjugate system into the list of systems
-        conjugate_systems = tf.concat(
-            [
-                conjugate_systems,
-                tf.expand_dims(
-                    conjugate_system,
-                    0)
-            ],
-            axis=0)
-
-        return conjugate_systems, visited
-
-    conjugate_systems, visited = tf.while_loop(
-        # while not all are visited
-        lambda conjugate_systems, visited: tf.reduce_any(
-            tf.logical_not(
-                visited)),
-
-        # loop_body
-        loop_body_outer,
-
-        # loop var
-        [conjugate_systems, visited],
-
-        shape_invariants=[
-            tf.TensorShape([None, sp2_idxs.shape[0]]),
-            tf.TensorShape((visited.get_shape()))])
-
-
-    # get rid of the empty entries
-    conjugate_systems = tf.boolean_mask(
-        conjugate_systems,
-        tf.reduce_any(
-            tf.greater(
-                conjugate_systems,
-                tf.constant(-1, dtype=tf.int64)),
-            axis=1))
-
+    # get the bonds in these systems
+    bond_idxs = tf.where(
+        tf.greater(
+            adjacency_map,
+            tf.constant(0, dtype=tf.float32)))
 
-    # while loop
-    idx = tf.constant(0, dtype=tf.int32)
-    bond_idxs_to_update = tf.constant([[-1, -1]], dtype=tf.int64)
-    bond_orders_to_update = tf.constant([-1], dtype=tf.float32)
+    bond_begin_system_idxs = tf.gather(
+        atom_system_idxs,
+        bond_idxs[:, 0])
 
-    # update the bond order according to conjugate_systems
-    def loop_body(idx,
-            bond_idxs_to_update,
-            bond_orders_to_update,
-            conjugate_systems=conjugate_systems,
-            sp2_idxs=sp2_idxs,
-            sp2_adjacency_map=sp2_adjacency_map):
-
-        # get the conjugate system and get rid of the padding
-        conjugate_system = conjugate_systems[idx, :]
-        conjugate_system = tf.boolean_mask(
-            conjugate_system,
-            tf.greater(
-                conjugate_system,
-                tf.constant(-1, dtype=tf.int64)))
-
-        # get the bonds in the system
-        system_idxs = tf.gather(
-            sp2_idxs,
-            conjugate_system)
+    bond_end_system_idxs = tf.gather(
+        atom_system_idxs,
+        bond_idxs[:, 1])
 
-        # get the full adjacency map
-        system_adjacency_map_full = tf.gather(
-            tf.gather(
-                sp2_adjacency_map,
-                conjugate_system,
-                axis=0),
-            conjugate_system,
-            axis=1),
+    is_system_bond = tf.logical_and(
+        tf.equal(
+            bond_begin_system_idxs,
+            bond_end_system_idxs),
+        tf.greater(
+            bond_begin_system_idxs,
+            tf.constant(-1, dtype=tf.int32)))
+
+    # the bonds outside of the systems go to an extra segment,
+    # which is left out of the update,
+    # so that every bond keeps its place
+    bond_system_idxs = tf.where(
+        is_system_bond,
+        bond_begin_system_idxs,
+        n_systems * tf.ones_like(bond_begin_system_idxs))
+
+    bond_orders = tf.gather_nd(
+        adjacency_map,
+        bond_idxs)
 
-        # flatten it to calculate average bond
-        system_adjacency_map_flatten = tf.reshape(
-            tf.linalg.band_part(
-                system_adjacency_map_full,
-                0, -1),
-            [-1])
-
-        # get the average bond order and count
-        system_total_bond_order = tf.reduce_sum(system_adjacency_map_flatten)
-        system_total_bond_count = tf.reduce_sum(
-            tf.boolean_mask(
-                tf.ones_like(
-                    system_adjacency_map_flatten,
-                    dtype=tf.float32),
-                tf.greater(
-                    system_adjacency_map_flatten,
-                    tf.constant(0, dtype=tf.float32))))
-
-        system_mean_bond_order = tf.math.divide(
-            system_total_bond_order,
-            system_total_bond_count)
-
-        # dirty stuff to get the bond indices to update
-        all_idxs_x, all_idxs_y = tf.meshgrid(
-            tf.range(n_atoms, dtype=tf.int64),
-            tf.range(n_atoms, dtype=tf.int64))
-
-        all_idxs_stack = tf.stack(
-            [
-                all_idxs_y,
-                all_idxs_x
-            ],
-            axis=2)
+    # set the bonds to the average bond order of their systems,
+    # calculated for all the systems at once
+    system_mean_bond_orders = tf.math.unsorted_segment_mean(
+        bond_orders,
+        bond_system_idxs,
+        n_systems + 1)
 
-        system_idxs_2d = tf.gather(
+    # scatter update
+    adjacency_map = tf.tensor_scatter_nd_update(
+        adjacency_map,
+        bond_idxs,
+        tf.where(
+            is_system_bond,
             tf.gather(
-                all_idxs_stack,
-                system_idxs,
-                axis=0),
-            system_idxs,
-            axis=1)
-
-        system_idxs_2d = tf.boolean_mask(
-            system_idxs_2d,
-            tf.greater(
-                tf.gather_nd(
-                    adjacency_map,
-                    system_idxs_2d),
-                tf.constant(0, dtype=tf.float32)))
-
-        bond_idxs_to_update = tf.concat(
-            [
-                bond_idxs_to_update,
-                system_idxs_2d
-            ],
-            axis=0)
-
-        bond_orders_to_update = tf.concat(
-            [
-                bond_orders_to_update,
-                tf.ones(
-                    (tf.cast(system_total_bond_count, tf.int32), ),
-                    dtype=tf.float32) \
-                    * system_mean_bond_order
-            ],
-            axis=0)
-
-        return idx + 1, bond_idxs_to_update, bond_orders_to_update
+                system_mean_bond_orders,
+                bond_system_idxs),
+            bond_orders))
+
+    return atoms, adjacency_map
+
+def parse_smiles(smiles):
+    """ Decode a SMILES string to atoms and adjacency map
+    in a single left-to-right pass in python.
+
+    This is the parser behind `to_mol` and `to_mols`,
+    and the reference for `smiles_to_organic_topological_molecule`.
+    It dispatches no TensorFlow ops,
+    which dominate the cost of parsing a small molecule.
+
+    The two parsers give the same molecule,
+    except where the tensorflow one gets the ring closures wrong:
+    - a ring digit used again after its ring is closed, e.g. `C1CC1C1CC1`;
+    - ring digits above 5, or not used in order from 1, e.g. `C2CC2`;
+    - a ring closed right after a branch, e.g. `C1CCC(C)1`;
+    - a branch ending in a run of branches, e.g. `C(C(C)(C))C`.
+    both reject the atoms and characters they do not support,
+    this one with a `ValueError`
+    and the tensorflow one with a `tf.errors.InvalidArgumentError`.
 
-    _, bond_idxs_to_update, bond_orders_to_update = tf.while_loop(
-        # condition
-        lambda idx, _1, _2: tf.less(
-            idx,
-            tf.shape(conjugate_systems)[0]),
+    Organic atoms:
+    [C, N, O, S, P, F, Cl, Br, I]
 
-        # loop body
-        loop_body,
+    Corresponding indices:
+    [0, 1, 2, 3, 4, 5, 6, 7, 8]
 
-        # var
-        [idx, bond_idxs_to_update, bond_orders_to_update],
+    NOTE: we assume the validity of the smiles string
+          beyond the atoms and characters that are supported.
 
-        shape_invariants = [
-            idx.get_shape(),
-            tf.TensorShape([None, 2]),
-            tf.TensorShape([None, ])])
+    Parameters
+    ----------
+    smiles : str,
+        smiles representation of a molecule.
 
-    # get rid of the placeholder
-    bond_idxs_to_update = bond_idxs_to_update[1:]
-    bond_orders_to_update = bond_orders_to_update[1:]
+    Returns
+    -------
+    atoms : np.ndarray, dtype=np.int64, shape=(n_atoms, )
+    adjacency_map : np.ndarray, dtype=np.float32, shape=(n_atoms, n_atoms)
+        upper triangular.
+
+    Raises
+    ------
+    ValueError
+        if the SMILES string has an element, a bracket atom (e.g. a charged
+        one), or a character (e.g. `.`, `%`) that is not supported.
+    """
+    # NOTE: SMILES strings read from csv files
+    #       sometimes come with trailing whitespace
+    smiles = smiles.strip()
+
+    atoms = []
+    is_aromatic = []
+
+    # {(i, j): order} with i < j
+    bonds = {}
+
+    prev_idx = -1
+    bond_order = None
+    branch_stack = []
+    ring_open = {}
+
+    for match in SMILES_TOKEN_REGEX.finditer(smiles):
+        kind = match.lastgroup
+        token = match.group(kind)
+
+        if kind == 'bracket_atom':
+            bracket_match = BRACKET_ATOM_REGEX.fullmatch(token)
+            if bracket_match is None:
+                raise ValueError(
+                    'Unsupported bracket atom {} in SMILES {}'.format(
+                        token, smiles))
+
+            token = bracket_match.group('element')
+            kind = 'atom'
+
+        if kind == 'atom':
+            if token not in ATOM_IDXS:
+                raise ValueError(
+                    'Unsupported element {} in SMILES {}'.format(
+                        token, smiles))
+
+            idx = len(atoms)
+            atoms.append(ATOM_IDXS[token])
+            is_aromatic.append(token in AROMATIC_ATOMS)
+
+            if prev_idx != -1:
+                bonds[prev_idx, idx] = bond_order or 1.0
+
+            prev_idx = idx
+            bond_order = None
+
+        elif kind == 'bond':
+            bond_order = BOND_ORDERS[token]
+
+        elif kind == 'branch_open':
+            branch_stack.append(prev_idx)
+
+        elif kind == 'branch_close':
+            prev_idx = branch_stack.pop()
+
+        elif kind == 'ring':
+            if token in ring_open:
+                ring_idx, ring_bond_order = ring_open.pop(token)
+                bonds[min(ring_idx, prev_idx), max(ring_idx, prev_idx)] = \
+                    bond_order or ring_bond_order or 1.0
+
+            else:
+                ring_open[token] = (prev_idx, bond_order)
+
+            bond_order = None
+
+        elif kind == 'stereo':
+            # NOTE: stereochemistry is not encoded
+            pass
+
+        else:
+            raise ValueError(
+                'Unsupported character {} at position {} in SMILES {}'.format(
+                    token, match.start(), smiles))
+
+    # the bond orders are worked out on the list of bonds,
+    # and only put into the adjacency map at the end
+    n_atoms = len(atoms)
+    atoms = np.array(atoms, dtype=np.int64)
+    is_aromatic = np.array(is_aromatic, dtype=np.bool_)
+    bond_idxs = np.array(list(bonds.keys()), dtype=np.int64).reshape(-1, 2)
+    bond_orders = np.array(list(bonds.values()), dtype=np.float32)
+    bond_begin_idxs = bond_idxs[:, 0]
+    bond_end_idxs = bond_idxs[:, 1]
 
-    # scatter update
-    adjacency_map.scatter_nd_update(
-        bond_idxs_to_update,
-        bond_orders_to_update)
+    # ===========
+    # aromaticity
+    # ===========
+    # the bonds between aromatic atoms get an extra half bond
+    bond_orders[
+        np.logical_and(
+            is_aromatic[bond_begin_idxs],
+            is_aromatic[bond_end_idxs])] += 0.5
 
-    return atoms, adjacency_map.read_value()
+    # =================
+    # conjugate systems
+    # =================
+    # atoms connected to double bonds, and aromatic atoms.
+    # NOTE: same as the tensorflow parser,
+    #       we only allow carbon, nitrogen, or oxygen
+    #       as part of our conjugate system
+    is_sp2 = np.array(is_aromatic)
+    is_sp2[bond_idxs[bond_orders == 2.0]] = True
+    is_sp2 = np.logical_and(
+        is_sp2,
+        atoms <= 2)
+
+    is_sp2_bond = np.logical_and(
+        is_sp2[bond_begin_idxs],
+        is_sp2[bond_end_idxs])
+
+    sp2_begin_idxs = bond_begin_idxs[is_sp2_bond]
+    sp2_end_idxs = bond_end_idxs[is_sp2_bond]
+
+    # label the connected sp2 atoms
+    # by propagating the smallest label along the bonds
+    # until nothing changes
+    system_labels = np.arange(n_atoms)
+    while True:
+        new_system_labels = np.array(system_labels)
+        np.minimum.at(
+            new_system_labels,
+            sp2_begin_idxs,
+            system_labels[sp2_end_idxs])
+        np.minimum.at(
+            new_system_labels,
+            sp2_end_idxs,
+            system_labels[sp2_begin_idxs])
+
+        if np.array_equal(new_system_labels, system_labels):
+            break
+
+        system_labels = new_system_labels
+
+    # set every bond in a system of at least three atoms
+    # to the average bond order of that system
+    system_sizes = np.bincount(
+        system_labels[is_sp2],
+        minlength=n_atoms)
+
+    is_system_bond = np.array(is_sp2_bond)
+    is_system_bond[is_sp2_bond] = system_sizes[
+        system_labels[sp2_begin_idxs]] >= 3
+
+    bond_systems = system_labels[bond_begin_idxs[is_system_bond]]
+
+    system_mean_bond_orders = np.bincount(
+        bond_systems,
+        weights=bond_orders[is_system_bond],
+        minlength=n_atoms) / np.maximum(
+            np.bincount(
+                bond_systems,
+                minlength=n_atoms),
+            1)
+
+    bond_orders[is_system_bond] = system_mean_bond_orders[bond_systems]
+
+    # build the adjacency map
+    adjacency_map = np.zeros((n_atoms, n_atoms), dtype=np.float32)
+    adjacency_map[bond_begin_idxs, bond_end_idxs] = bond_orders
+
+    return atoms, adjacency_map
 
 def to_mol(
         smiles,
@@ -1285,36 +1197,136 @@ def to_mol(
     """ Wrapper function for translating one SMILES string to molecule.
     """
     if chiral == False:
-        mol = smiles_to_organic_topological_molecule(smiles)
+        # NOTE: `tf.py_function` hands us a scalar string tensor
+        if isinstance(smiles, tf.Tensor):
+            smiles = smiles.numpy()
+
+        if isinstance(smiles, bytes):
+            smiles = smiles.decode('utf-8')
+
+        atoms, adjacency_map = _to_mol_cached(smiles)
+        mol = tf.constant(atoms), tf.constant(adjacency_map)
 
     else:
         return NotImplementedError
 
     return mol
 
+@functools.lru_cache(maxsize=MOL_CACHE_SIZE)
+def _to_mol_cached(smiles):
+    """ Translate one SMILES string to numpy arrays,
+    remembering the results for the SMILES strings seen recently,
+    since datasets are usually parsed again every epoch.
+
+    NOTE: the same arrays are handed out for every call,
+          so they are made read-only.
+    """
+    atoms, adjacency_map = parse_smiles(smiles)
+    atoms.flags.writeable = False
+    adjacency_map.flags.writeable = False
+    return atoms, adjacency_map
+
+def _batch_to_mol(smiles_batch):
+    """ Translate a batch of SMILES strings to molecules,
+    zero-padded to the largest molecule in the batch,
+    so that the dataset only calls into python once per batch.
+
+    Parameters
+    ----------
+    smiles_batch : np.ndarray, dtype=object, shape=(batch_size, )
+        utf-8 encoded smiles strings.
+
+    Returns
+    -------
+    atoms : np.ndarray, dtype=np.int64, shape=(batch_size, max_n_atoms)
+    adjacency_map : np.ndarray, dtype=np.float32,
+        shape=(batch_size, max_n_atoms, max_n_atoms)
+    n_atoms : np.ndarray, dtype=np.int64, shape=(batch_size, )
+    """
+    mols = [_to_mol_cached(smiles.decode('utf-8')) for smiles in smiles_batch]
+    n_atoms = np.array(
+        [mol[0].shape[0] for mol in mols],
+        dtype=np.int64)
+    max_n_atoms = n_atoms.max(initial=0)
+
+    atoms = np.zeros(
+        (len(mols), max_n_atoms),
+        dtype=np.int64)
+    adjacency_map = np.zeros(
+        (len(mols), max_n_atoms, max_n_atoms),
+        dtype=np.float32)
+
+    for idx, (mol_atoms, mol_adjacency_map) in enumerate(mols):
+        atoms[idx, :n_atoms[idx]] = mol_atoms
+        adjacency_map[idx, :n_atoms[idx], :n_atoms[idx]] = mol_adjacency_map
+
+    return atoms, adjacency_map, n_atoms
+
+def _batch_to_mol_tf(smiles_batch):
+    """ Graph wrapper of `_batch_to_mol`, with the ranks of the outputs set
+    so that the results can be unbatched.
+    """
+    atoms, adjacency_map, n_atoms = tf.numpy_function(
+        _batch_to_mol,
+        [smiles_batch],
+        Tout=(tf.int64, tf.float32, tf.int64))
+
+    atoms.set_shape([None, None])
+    adjacency_map.set_shape([None, None, None])
+    n_atoms.set_shape([None])
+
+    return atoms, adjacency_map, n_atoms
 
 def to_mols(
         smiles_array,
-        chiral=False): # TODO: chiral is unused
+        chiral=False, # TODO: chiral is unused
+        batch_size=64,
+        cache_filename=None):
     """ Wrapper function for translating multiple SMILES strings to molecules.
+
+    NOTE: with `cache_filename`, the molecules are written to that file
+          the first time the dataset is iterated over,
+          and read from it afterwards.
+          the cache is keyed by the filename only:
+          a cache file left by a different list of SMILES strings
+          is read back as it is, without any warning.
     """
     # put the smiles into a large tensor
     smiles_array = tf.convert_to_tensor(smiles_array, dtype=tf.string)
 
     ds_smiles = tf.data.Dataset.from_tensor_slices(smiles_array)
 
-    ds = ds_smiles.map(lambda x: tf.py_function(
-        to_mol,
-        [x],
-        [tf.int64, tf.float32]))
+    ds = ds_smiles.batch(batch_size).map(
+        _batch_to_mol_tf,
+        num_parallel_calls=tf.data.experimental.AUTOTUNE)
+
+    # strip the padding off every molecule
+    ds = ds.unbatch().map(
+        lambda atoms, adjacency_map, n_atoms: (
+            atoms[:n_atoms],
+            adjacency_map[:n_atoms, :n_atoms]))
+
+    if cache_filename is not None:
+        ds = ds.cache(cache_filename)
+
+    ds = ds.prefetch(tf.data.experimental.AUTOTUNE)
 
     return ds
 
 def to_mols_with_attributes(
         smiles_array,
         attributes_array,
-        chiral=False):
+        chiral=False,
+        batch_size=64,
+        cache_filename=None):
     """ Wrapper function for translating multiple SMILES strings to molecules.
+
+    NOTE: with `cache_filename`, the molecules are written to that file
+          the first time the dataset is iterated over,
+          and read from it afterwards.
+          the cache is keyed by the filename only:
+          a cache file left by a different list of SMILES strings
+          is read back as it is, without any warning.
     """
     # put the smiles into a large tensor
     smiles_array = tf.convert_to_tensor(smiles_array, dtype=tf.string)
@@ -1322,9 +1334,20 @@ def to_mols_with_attributes(
 
     ds = tf.data.Dataset.from_tensor_slices((smiles_array, attributes_array))
 
-    ds = ds.map(lambda x, y: tf.py_function(
-        lambda x,y: (to_mol(x)[0], to_mol(x)[1], y),
-        [x, y],
-        [tf.int64, tf.float32, tf.float32]))
+    ds = ds.batch(batch_size).map(
+        lambda x, y: _batch_to_mol_tf(x) + (y, ),
+        num_parallel_calls=tf.data.experimental.AUTOTUNE)
+
+    # strip the padding off every molecule
+    ds = ds.unbatch().map(
+        lambda atoms, adjacency_map, n_atoms, y: (
+            atoms[:n_atoms],
+            adjacency_map[:n_atoms, :n_atoms],
+            y))
+
+    if cache_filename is not None:
+        ds = ds.cache(cache_filename)
+
+    ds = ds.prefetch(tf.data.experimental.AUTOTUNE)
 
     return ds
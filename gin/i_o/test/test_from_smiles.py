@@ -1,7 +1,9 @@
 import pytest
 from gin.i_o.from_smiles import *
+from gin.i_o import from_smiles
 import numpy as np
 import numpy.testing as npt
+import tensorflow as tf
 
 
 def test_ethane():
@@ -173,5 +175,256 @@ def test_3_3_dimethylpentane():
              [0, 0, 0, 0, 0, 0, 1],
              [0, 0, 0, 0, 0, 0, 0]]))
 
+def test_2_pyridone():
+    # the aromatic carbon with the double bond to oxygen
+    # is counted once in the conjugate system,
+    # which has seven bonds of 11 bond orders in total
+    for atoms, adjacency_map in [
+            parse_smiles('O=c1cccc[nH]1'),
+            [x.numpy() for x in smiles_to_organic_topological_molecule(
+                'O=c1cccc[nH]1')]]:
+        npt.assert_equal(
+            atoms,
+            np.array([2, 0, 0, 0, 0, 0, 1]))
+        npt.assert_almost_equal(
+            adjacency_map,
+            11 / 7 * np.array(
+                [[0, 1, 0, 0, 0, 0, 0],
+                 [0, 0, 1, 0, 0, 0, 1],
+                 [0, 0, 0, 1, 0, 0, 0],
+                 [0, 0, 0, 0, 1, 0, 0],
+                 [0, 0, 0, 0, 0, 1, 0],
+                 [0, 0, 0, 0, 0, 0, 1],
+                 [0, 0, 0, 0, 0, 0, 0]]),
+            decimal=5)
+
+
+def test_explicit_single_bond():
+    atoms, adjacency_map = smiles_to_organic_topological_molecule('C-C')
+    npt.assert_almost_equal(
+        adjacency_map.numpy(),
+        np.array(
+            [[0, 1],
+             [0, 0]]))
+    npt.assert_almost_equal(
+        atoms.numpy(),
+        np.array(
+            [0, 0]))
+
+def test_fluorene():
+    # explicit single bond to a ring closure
+    smiles = 'c1ccc-2c(c1)Cc3c2cccc3'
+    atoms, adjacency_map = smiles_to_organic_topological_molecule(smiles)
+    atoms_py, adjacency_map_py = parse_smiles(smiles)
+
+    npt.assert_equal(
+        atoms.numpy(),
+        np.zeros(13))
+    npt.assert_equal(
+        atoms.numpy(),
+        atoms_py)
+    npt.assert_almost_equal(
+        adjacency_map.numpy(),
+        adjacency_map_py)
+
+@pytest.mark.parametrize('smiles', [
+    'CB',
+    'C.C',
+    'C*C',
+    'C%10CC%10'])
+def test_unsupported(smiles):
+    with pytest.raises(tf.errors.InvalidArgumentError):
+        smiles_to_organic_topological_molecule(smiles)
+
+
+def test_parse_smiles():
+    for smiles in [
+            'CC',
+            'C=C',
+            'CC(C)C',
+            'O=C(OCC(C)C)C',
+            'c1ccccc1',
+            'Cn1cnc2c1c(=O)n(c(=O)n2C)C',
+            'c1ccc2ccccc2c1',
+            'c1c(=O)[nH]c(=O)[nH]c1Cl',
+            'C#CBr']:
+        atoms, adjacency_map = parse_smiles(smiles)
+        atoms_tf, adjacency_map_tf = smiles_to_organic_topological_molecule(
+            smiles)
+        npt.assert_equal(
+            atoms,
+            atoms_tf.numpy())
+        npt.assert_almost_equal(
+            adjacency_map,
+            adjacency_map_tf.numpy())
+
+
+# NOTE: the tensorflow parser gets the ring closures below wrong,
+#       so these pin `parse_smiles`, which `to_mol` uses
+
+def test_bicyclopropyl():
+    # ring digit used twice
+    atoms, adjacency_map = parse_smiles('C1CC1C1CC1')
+    npt.assert_equal(
+        atoms,
+        np.array([0, 0, 0, 0, 0, 0]))
+    npt.assert_almost_equal(
+        adjacency_map,
+        np.array(
+            [[0, 1, 1, 0, 0, 0],
+             [0, 0, 1, 0, 0, 0],
+             [0, 0, 0, 1, 0, 0],
+             [0, 0, 0, 0, 1, 1],
+             [0, 0, 0, 0, 0, 1],
+             [0, 0, 0, 0, 0, 0]]))
+
+def test_methylcyclobutane():
+    # ring closed right after a branch
+    atoms, adjacency_map = parse_smiles('C1CCC(C)1')
+    npt.assert_almost_equal(
+        adjacency_map,
+        np.array(
+            [[0, 1, 0, 1, 0],
+             [0, 0, 1, 0, 0],
+             [0, 0, 0, 1, 0],
+             [0, 0, 0, 0, 1],
+             [0, 0, 0, 0, 0]]))
+
+def test_cyclopropane_ring_digit_2():
+    # ring digit 2 without 1
+    atoms, adjacency_map = parse_smiles('C2CC2')
+    npt.assert_almost_equal(
+        adjacency_map,
+        np.array(
+            [[0, 1, 1],
+             [0, 0, 1],
+             [0, 0, 0]]))
+
+def test_six_cyclopropanes():
+    # more than five ring digits
+    atoms, adjacency_map = parse_smiles(
+        'C1CC1C2CC2C3CC3C4CC4C5CC5C6CC6')
+
+    expected_adjacency_map = np.zeros((18, 18))
+    for ring_idx in range(6):
+        first_idx = 3 * ring_idx
+        expected_adjacency_map[first_idx, first_idx + 1] = 1
+        expected_adjacency_map[first_idx, first_idx + 2] = 1
+        expected_adjacency_map[first_idx + 1, first_idx + 2] = 1
+        if ring_idx < 5:
+            # bond to the next ring
+            expected_adjacency_map[first_idx + 2, first_idx + 3] = 1
+
+    npt.assert_almost_equal(
+        adjacency_map,
+        expected_adjacency_map)
+
+
+@pytest.mark.parametrize('smiles', [
+    'C[Si](C)C', # element not supported
+    'C[Se]C',
+    '[Na+].[Cl-]', # charges and disconnected parts
+    'CC(=O)[O-]',
+    'C[S+2]C',
+    'C.C',
+    'C%10CC%10', # two-digit ring closure
+    'CC*', # unknown character
+])
+def test_parse_smiles_unsupported(smiles):
+    with pytest.raises(ValueError):
+        parse_smiles(smiles)
+
+def test_parse_smiles_bracket_atoms():
+    atoms, adjacency_map = parse_smiles('[13CH3][C@@H](Br)[nH] ')
+    npt.assert_equal(
+        atoms,
+        np.array([0, 0, 7, 1]))
+    npt.assert_almost_equal(
+        adjacency_map,
+        np.array(
+            [[0, 1, 0, 0],
+             [0, 0, 1, 1],
+             [0, 0, 0, 0],
+             [0, 0, 0, 0]]))
+
+
+# SMILES strings of mixed sizes,
+# so that the batches are padded
+TO_MOLS_SMILES = [
+    'CC',
+    'Cn1cnc2c1c(=O)n(c(=O)n2C)C',
+    'C=C',
+    'c1ccc2ccccc2c1',
+    'CC(C)C',
+    'O=C(OCC(C)C)C',
+    'C#CBr']
+
+# batch sizes with a partial last batch,
+# and with one partial batch only
+@pytest.mark.parametrize('batch_size', [1, 3, 64])
+def test_to_mols(batch_size):
+    mols = list(to_mols(TO_MOLS_SMILES, batch_size=batch_size))
+    assert len(mols) == len(TO_MOLS_SMILES)
+
+    for (atoms, adjacency_map), smiles in zip(mols, TO_MOLS_SMILES):
+        atoms_ref, adjacency_map_ref = to_mol(smiles)
+        npt.assert_equal(
+            atoms.numpy(),
+            atoms_ref.numpy())
+        npt.assert_equal(
+            adjacency_map.numpy(),
+            adjacency_map_ref.numpy())
+
+@pytest.mark.parametrize('attributes_shape', [
+    (len(TO_MOLS_SMILES), ),
+    (len(TO_MOLS_SMILES), 2)])
+def test_to_mols_with_attributes(attributes_shape):
+    attributes_array = np.arange(
+        np.prod(attributes_shape),
+        dtype=np.float32).reshape(attributes_shape)
+
+    mols = list(to_mols_with_attributes(
+            TO_MOLS_SMILES,
+            attributes_array,
+            batch_size=3))
+    assert len(mols) == len(TO_MOLS_SMILES)
+
+    for (atoms, adjacency_map, attributes), smiles, attributes_ref in zip(
+            mols, TO_MOLS_SMILES, attributes_array):
+        atoms_ref, adjacency_map_ref = to_mol(smiles)
+        npt.assert_equal(
+            atoms.numpy(),
+            atoms_ref.numpy())
+        npt.assert_equal(
+            adjacency_map.numpy(),
+            adjacency_map_ref.numpy())
+        npt.assert_equal(
+            attributes.numpy(),
+            attributes_ref)
+
+
+def test_to_mols_cache_filename(tmp_path):
+    ds = to_mols(
+        TO_MOLS_SMILES,
+        batch_size=3,
+        cache_filename=str(tmp_path / 'mols'))
+    mols = list(ds)
+
+    # the second pass reads the molecules from the cache file
+    # without parsing any SMILES string
+    from_smiles._to_mol_cached.cache_clear()
+    mols_cached = list(ds)
+    assert from_smiles._to_mol_cached.cache_info().misses == 0
+
+    assert len(mols_cached) == len(mols)
+    for (atoms, adjacency_map), (atoms_cached, adjacency_map_cached) in zip(
+            mols, mols_cached):
+        npt.assert_equal(
+            atoms_cached.numpy(),
+            atoms.numpy())
+        npt.assert_equal(
+            adjacency_map_cached.numpy(),
+            adjacency_map.numpy())
+
 
 print(smiles_to_organic_topological_molecule('Clc1ccc(I)cc1'))
@@ -30,10 +30,12 @@ SOFTWARE.
 # =============================================================================
 # imports
 # =============================================================================
-import tensorflow as tf
-# tf.enable_eager_execution()
 import os
+# NOTE: this is read when TensorFlow is imported,
+#       so it has to be set before the import
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+import tensorflow as tf
+# tf.enable_eager_execution()
 import multiprocessing
 N_CPUS = multiprocessing.cpu_count()
 